@@ -3,7 +3,8 @@ GCC Food Inspection Management System - Python/Flask
 
 Main application entry point. Starts the Flask server, initialises
 the database, syncs premises data from the Idox Uniform SOAP Licensing
-Connector (or sample data), and serves the inspection management dashboard.
+Connector (or sample data) on a background thread, and serves the
+inspection management dashboard.
 
 Architecture:
   +---------------------------------------------------+
@@ -42,10 +43,16 @@ To run locally:
   2. pip install -r requirements.txt
   3. python app.py
 """
+import hashlib
 import logging
 import os
+import sys
 
-from flask import Flask, send_from_directory
+import orjson
+from flask import Flask, Response, request
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+from waitress import serve
+from whitenoise import WhiteNoise
 
 import config
 import database
@@ -56,78 +63,150 @@ logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
 )
+# At DEBUG these dump every SOAP envelope and connection; keep them quiet
+# even if the root level is lowered for the app's own diagnostics.
+for _noisy in ("zeep.transports", "urllib3.connectionpool"):
+    logging.getLogger(_noisy).setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
+
+class _OrjsonProvider(JSONProvider):
+    """
+    JSON provider backed by orjson, so jsonify() serialises straight to
+    bytes. Output matches Flask's default provider: keys are sorted, and
+    types orjson does not handle the same way (datetimes, Decimal, ...)
+    fall back to Flask's own conversion.
+    """
+    option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=DefaultJSONProvider.default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=DefaultJSONProvider.default, option=self.option)
+        return self._app.response_class(body, mimetype="application/json")
+
+
 app = Flask(
     __name__,
     static_folder="static",
     template_folder="templates",
 )
 
+app.json = _OrjsonProvider(app)
+
 # Register API blueprint
 app.register_blueprint(api, url_prefix="/api")
 
+# Serve /static/* from WhiteNoise ahead of Flask, so CSS/JS requests
+# never reach the Python request handlers.
+app.wsgi_app = WhiteNoise(
+    app.wsgi_app,
+    root=os.path.join(app.root_path, "static"),
+    prefix="/static/",
+)
+
 
 # -- Frontend Routes -------------------------------------------------------
 
+def _load_shell(filename):
+    """Read a static HTML shell once and compute its strong ETag."""
+    with open(os.path.join(app.root_path, "templates", filename), "rb") as f:
+        body = f.read()
+    return body, hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+# The page shells are static and small, so they are held in memory and
+# served with an ETag; repeat loads become 304s with no filesystem access.
+DASHBOARD_HTML, DASHBOARD_ETAG = _load_shell("dashboard.html")
+INSPECTION_FORM_HTML, INSPECTION_FORM_ETAG = _load_shell("inspection_form.html")
+VISIT_SHEET_HTML, VISIT_SHEET_ETAG = _load_shell("visit_sheet_viewer.html")
+
+
+def _serve_shell(body, etag):
+    response = Response(body, mimetype="text/html")
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 300
+    return response.make_conditional(request)
+
+
 @app.route("/")
 def dashboard():
     """Serve the main dashboard."""
-    return send_from_directory("templates", "dashboard.html")
+    return _serve_shell(DASHBOARD_HTML, DASHBOARD_ETAG)
 
 
 @app.route("/form/")
 @app.route("/form/<path:subpath>")
 def inspection_form(subpath=None):
     """Serve the digital inspection form."""
-    return send_from_directory("templates", "inspection_form.html")
+    return _serve_shell(INSPECTION_FORM_HTML, INSPECTION_FORM_ETAG)
 
 
 @app.route("/visit-sheet/<path:premises_ref>")
 def visit_sheet_viewer(premises_ref):
     """Serve the visit sheet viewer."""
-    return send_from_directory("templates", "visit_sheet_viewer.html")
+    return _serve_shell(VISIT_SHEET_HTML, VISIT_SHEET_ETAG)
 
 
 # -- Startup ---------------------------------------------------------------
 
+def _banner():
+    rule = "=" * 60
+    return "\n".join([
+        "",
+        rule,
+        "  Gloucester City Council",
+        "  Food Inspection Management System",
+        "  (Python/Flask + Uniform SOAP Connector)",
+        rule,
+        f"  Dashboard:       http://localhost:{config.PORT}/",
+        f"  Inspection Form: http://localhost:{config.PORT}/form/",
+        f"  API:             http://localhost:{config.PORT}/api/",
+        rule,
+        f"  Uniform SOAP:    {config.UNIFORM_WSDL_URL}",
+        f"  Database ID:     {config.UNIFORM_DATABASE_ID}",
+        f"  State:           {config.UNIFORM_STATE_SWITCH}",
+        "  Premises sync:   in progress (see /api/uniform/status)",
+        rule,
+        "",
+        "",
+    ])
+
+
 def initialise():
-    """Initialise database and sync premises data."""
+    """Initialise database and start syncing premises data in the background."""
     database.init_schema()
+    database.warm_cache()
+    database.start_maintenance()
     logger.info("Database initialised")
 
-    logger.info("Syncing premises from Idox Uniform SOAP connector...")
-    sync_result = uniform_sync.sync_premises()
-    logger.info("Sync source: %s", sync_result["source"])
-    logger.info("Premises synced: %d", sync_result["count"])
-    for err in sync_result.get("errors", []):
-        logger.warning("Sync note: %s", err)
-
-    return sync_result
+    logger.info("Syncing premises from Idox Uniform SOAP connector in the background...")
+    return uniform_sync.start_background_sync()
 
 
 if __name__ == "__main__":
-    sync_result = initialise()
-
-    print()
-    print("=" * 60)
-    print("  Gloucester City Council")
-    print("  Food Inspection Management System")
-    print("  (Python/Flask + Uniform SOAP Connector)")
-    print("=" * 60)
-    print(f"  Dashboard:       http://localhost:{config.PORT}/")
-    print(f"  Inspection Form: http://localhost:{config.PORT}/form/")
-    print(f"  API:             http://localhost:{config.PORT}/api/")
-    print("=" * 60)
-    print(f"  Uniform SOAP:    {config.UNIFORM_WSDL_URL}")
-    print(f"  Database ID:     {config.UNIFORM_DATABASE_ID}")
-    print(f"  State:           {config.UNIFORM_STATE_SWITCH}")
-    print(f"  Premises loaded: {sync_result['count']}")
-    print("=" * 60)
-    print()
-
-    app.run(
-        host=config.HOST,
-        port=config.PORT,
-        debug=config.DEBUG,
-    )
+    initialise()
+
+    sys.stdout.write(_banner())
+
+    if config.DEBUG:
+        # The reloader would re-exec this module and run initialise() (and
+        # the Uniform sync) a second time in the child process.
+        app.run(host=config.HOST, port=config.PORT, debug=True, use_reloader=False)
+    else:
+        # One request thread per reader connection, so handlers never
+        # queue for a database connection.
+        serve(
+            app,
+            host=config.HOST,
+            port=config.PORT,
+            threads=config.DB_READ_POOL_SIZE,
+            connection_limit=1000,
+            channel_timeout=30,
+        )
@@ -19,6 +19,13 @@ UNIFORM_STATE_SWITCH = os.getenv("UNIFORM_STATE_SWITCH", "_TEST")
 UNIFORM_USERNAME = os.getenv("UNIFORM_USERNAME", "")
 UNIFORM_PASSWORD = os.getenv("UNIFORM_PASSWORD", "")
 UNIFORM_TIMEOUT = int(os.getenv("UNIFORM_TIMEOUT", "30"))
+# On-disk cache of the downloaded WSDL/XSD documents (seconds to keep)
+UNIFORM_WSDL_CACHE_PATH = os.getenv("UNIFORM_WSDL_CACHE_PATH", "data/zeep_cache.db")
+UNIFORM_WSDL_CACHE_TTL = int(os.getenv("UNIFORM_WSDL_CACHE_TTL", "86400"))
+# Seconds a connector logon is kept idle for reuse before logging on again
+UNIFORM_SESSION_IDLE_TTL = int(os.getenv("UNIFORM_SESSION_IDLE_TTL", "300"))
+# Seconds fee and code-list lookups are cached before asking Uniform again
+UNIFORM_REFDATA_TTL = int(os.getenv("UNIFORM_REFDATA_TTL", "600"))
 
 # Derived SOAP endpoint URL
 UNIFORM_WSDL_URL = (
@@ -29,6 +36,10 @@ UNIFORM_WSDL_URL = (
 
 # SQLite database
 DB_PATH = os.getenv("DB_PATH", "data/food_inspections.db")
+# Read-only connections shared by request handlers (writes use one connection)
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", str(os.cpu_count() or 4)))
+# Seconds between background PRAGMA optimize / WAL checkpoint runs
+DB_MAINTENANCE_INTERVAL = int(os.getenv("DB_MAINTENANCE_INTERVAL", "900"))
 
 # Report output directory
 REPORT_OUTPUT = os.getenv("REPORT_OUTPUT", "data/reports")
@@ -5,34 +5,253 @@ management of inspection records.
 Acts as a local mirror of Idox Uniform data so that officers can
 work offline, and stores inspection visit sheets and generated reports.
 """
+import logging
 import os
+import queue
 import sqlite3
-import json
-import random
-from datetime import datetime
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import orjson
 
 import config
 
-_db = None
+logger = logging.getLogger(__name__)
+
+# Connection pools, created on first use. WAL allows many concurrent
+# readers alongside a single writer, so writes share one connection
+# (acting as a mutex) while request handlers draw from the reader pool.
+_write_pool = None
+_read_pool = None
+_pool_lock = threading.Lock()
+# Tracks the writer connection held by the current thread, so nested
+# get_write_conn() blocks join the outer transaction.
+_write_state = threading.local()
+# Incremented after every committed write transaction, so callers can tell
+# whether anything they derived from the database may have gone stale.
+_data_version = 0
+
+# Applied to every new connection. synchronous=NORMAL is crash-safe under
+# WAL; busy_timeout lets writers wait out a concurrent sync rather than
+# failing with SQLITE_BUSY; cache_size is negative KiB (~20 MB); mmap_size
+# lets reads be served from a 256 MiB memory map instead of read() calls.
+_CONNECTION_PRAGMAS = """
+    PRAGMA synchronous=NORMAL;
+    PRAGMA busy_timeout=5000;
+    PRAGMA cache_size=-20000;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA mmap_size=268435456;
+    PRAGMA foreign_keys=ON;
+"""
+
+
+def _db_path():
+    """Resolve the configured database path, creating its directory."""
+    db_path = os.path.abspath(config.DB_PATH)
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    return db_path
+
+
+# Prepared statements kept per connection (sqlite3 defaults to 128). The
+# hot queries are fixed strings, so they are parsed once per connection.
+_STATEMENT_CACHE_SIZE = 256
+
 
+def _enable_wal(conn):
+    """
+    Switch the database to write-ahead logging so dashboard reads are not
+    blocked by sync writes. WAL is persistent in the database file, so this
+    only needs to succeed once.
+    """
+    mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+    if mode.lower() != "wal":
+        logger.warning("SQLite journal_mode is %r, expected 'wal'", mode)
 
-def get_db():
-    """Get or create the SQLite database connection."""
-    global _db
-    if _db is None:
-        db_path = os.path.abspath(config.DB_PATH)
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        _db = sqlite3.connect(db_path, check_same_thread=False)
-        _db.row_factory = sqlite3.Row
-        _db.execute("PRAGMA journal_mode=WAL")
-        _db.execute("PRAGMA foreign_keys=ON")
-        init_schema()
-    return _db
+
+def _connect(db_path, read_only=False):
+    """Open a new SQLite connection with the standard PRAGMAs applied."""
+    conn = sqlite3.connect(
+        db_path, check_same_thread=False, cached_statements=_STATEMENT_CACHE_SIZE,
+    )
+    # Transactions are managed explicitly by get_write_conn().
+    conn.isolation_level = None
+    conn.row_factory = sqlite3.Row
+    if not read_only:
+        # Only takes effect while the file is still empty, i.e. before WAL
+        # mode and the schema are written; existing databases keep theirs.
+        conn.execute("PRAGMA page_size=8192")
+        _enable_wal(conn)
+    conn.executescript(_CONNECTION_PRAGMAS)
+    if read_only:
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+def _get_pools():
+    """Create the writer and reader pools on first use."""
+    global _write_pool, _read_pool
+    if _write_pool is None:
+        with _pool_lock:
+            if _write_pool is None:
+                db_path = _db_path()
+                write_pool = queue.Queue(maxsize=1)
+                write_pool.put(_connect(db_path))
+                _create_schema(write_pool.queue[0])
+                _log_storage_settings(write_pool.queue[0])
+                read_pool = queue.LifoQueue(maxsize=config.DB_READ_POOL_SIZE)
+                for _ in range(config.DB_READ_POOL_SIZE):
+                    read_pool.put(_connect(db_path, read_only=True))
+                _read_pool = read_pool
+                _write_pool = write_pool
+    return _write_pool, _read_pool
+
+
+def _log_storage_settings(conn):
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    mmap_size = conn.execute("PRAGMA mmap_size").fetchone()[0]
+    logger.info("SQLite page_size=%d, mmap_size=%d", page_size, mmap_size)
+
+
+@contextmanager
+def _checkout(pool):
+    """Borrow a connection from a pool, returning it when done."""
+    conn = pool.get()
+    try:
+        yield conn
+    finally:
+        pool.put(conn)
+
+
+@contextmanager
+def get_read_conn():
+    """Borrow a read-only connection from the reader pool."""
+    with _checkout(_get_pools()[1]) as conn:
+        yield conn
+
+
+@contextmanager
+def get_write_conn():
+    """
+    Borrow the writer connection inside a transaction.
+
+    The transaction is opened with BEGIN IMMEDIATE so the write lock is
+    taken up front rather than upgraded mid-transaction, and is committed
+    on exit or rolled back if the block raises. Nested calls on the same
+    thread reuse the outer transaction, so callers such as the Uniform
+    sync can group several writes into one commit.
+    """
+    global _data_version
+    conn = getattr(_write_state, "conn", None)
+    if conn is not None:
+        yield conn
+        return
+    with _checkout(_get_pools()[0]) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _write_state.conn = conn
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+            # Only one thread can hold the writer, so this is not racy.
+            _data_version += 1
+        finally:
+            _write_state.conn = None
+
+
+def data_version():
+    """Return a counter that changes whenever a write is committed."""
+    return _data_version
 
 
 def init_schema():
-    """Create database tables if they don't already exist."""
-    db = get_db()
+    """
+    Create database tables if they don't already exist. The schema is
+    created when the pools are first opened, so after that this is free.
+    """
+    _get_pools()
+
+
+def warm_cache():
+    """
+    Touch the main tables so the first dashboard request reads from warm
+    pages, and let SQLite refresh planner statistics where they are stale.
+    """
+    with get_read_conn() as db:
+        db.execute("SELECT COUNT(*) FROM premises").fetchone()
+        db.execute("SELECT COUNT(*) FROM inspections").fetchone()
+    # PRAGMA optimize may run ANALYZE, which needs the writer.
+    write_pool, _ = _get_pools()
+    with _checkout(write_pool) as db:
+        db.execute("PRAGMA optimize")
+
+
+def checkpoint(truncate=False):
+    """
+    Copy committed WAL frames back into the database file. PASSIVE gives
+    way to active readers and writers; TRUNCATE waits for them and then
+    empties the -wal file, which is worth it after a large write. Must not
+    be called while this thread holds a write transaction.
+    """
+    if getattr(_write_state, "conn", None) is not None:
+        raise RuntimeError("checkpoint() called inside a write transaction")
+    mode = "TRUNCATE" if truncate else "PASSIVE"
+    write_pool, _ = _get_pools()
+    with _checkout(write_pool) as db:
+        db.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+
+
+_maintenance_stop = threading.Event()
+
+
+def start_maintenance(interval=None):
+    """
+    Start a daemon thread that refreshes planner statistics and runs a
+    passive WAL checkpoint every ``interval`` seconds (default
+    config.DB_MAINTENANCE_INTERVAL), keeping the WAL short between syncs.
+    """
+    interval = config.DB_MAINTENANCE_INTERVAL if interval is None else interval
+    _maintenance_stop.clear()
+    thread = threading.Thread(
+        target=_run_maintenance, args=(interval,), name="db-maintenance", daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def _run_maintenance(interval):
+    while not _maintenance_stop.wait(interval):
+        try:
+            write_pool, _ = _get_pools()
+            with _checkout(write_pool) as db:
+                db.execute("PRAGMA optimize")
+                db.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        except Exception:
+            logger.exception("Database maintenance failed")
+
+
+# Ordinal used to sort premises by risk (A first). Materialised as the
+# premises.risk_rank generated column so the due index can cover it.
+_RISK_RANK_SQL = """CASE risk_category
+                WHEN 'A' THEN 1
+                WHEN 'B' THEN 2
+                WHEN 'C' THEN 3
+                WHEN 'D' THEN 4
+                WHEN 'E' THEN 5
+                ELSE 6
+              END"""
+
+# Stored in PRAGMA user_version once the schema below has been applied.
+# Bump it whenever the schema changes so existing databases pick it up.
+_SCHEMA_VERSION = 5
+
+
+def _create_schema(db):
+    if db.execute("PRAGMA user_version").fetchone()[0] == _SCHEMA_VERSION:
+        return
     db.executescript("""
         CREATE TABLE IF NOT EXISTS premises (
             premises_ref TEXT PRIMARY KEY,
@@ -66,7 +285,8 @@ def init_schema():
             primary_authority TEXT,
             notes TEXT,
             synced_at TEXT DEFAULT (datetime('now')),
-            updated_at TEXT DEFAULT (datetime('now'))
+            updated_at TEXT DEFAULT (datetime('now')),
+            risk_rank INTEGER GENERATED ALWAYS AS (""" + _RISK_RANK_SQL + """) VIRTUAL
         );
 
         CREATE TABLE IF NOT EXISTS previous_actions (
@@ -118,12 +338,24 @@ def init_schema():
             inspection_id INTEGER NOT NULL,
             premises_ref TEXT NOT NULL,
             report_html TEXT,
+            content_hash TEXT,
             generated_at TEXT DEFAULT (datetime('now')),
             sent_at TEXT,
             FOREIGN KEY (inspection_id) REFERENCES inspections(id),
             FOREIGN KEY (premises_ref) REFERENCES premises(premises_ref)
         );
 
+        CREATE TABLE IF NOT EXISTS sync_state (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+
+        -- Last inspection reference suffix issued per day (YYYYMMDD).
+        CREATE TABLE IF NOT EXISTS ref_seq (
+            day TEXT PRIMARY KEY,
+            n INTEGER NOT NULL DEFAULT 0
+        );
+
         CREATE INDEX IF NOT EXISTS idx_premises_next_inspection
             ON premises(next_inspection_due);
         CREATE INDEX IF NOT EXISTS idx_premises_risk
@@ -133,7 +365,49 @@ def init_schema():
         CREATE INDEX IF NOT EXISTS idx_inspections_date
             ON inspections(inspection_date);
     """)
-    db.commit()
+    # Columns added after the table was first released. SQLite can only
+    # add VIRTUAL generated columns to an existing table.
+    premises_columns = {row["name"] for row in db.execute("PRAGMA table_xinfo(premises)")}
+    if "risk_rank" not in premises_columns:
+        db.execute(
+            "ALTER TABLE premises ADD COLUMN risk_rank INTEGER"
+            " GENERATED ALWAYS AS (" + _RISK_RANK_SQL + ") VIRTUAL"
+        )
+    report_columns = {row["name"] for row in db.execute("PRAGMA table_info(owner_reports)")}
+    if "content_hash" not in report_columns:
+        db.execute("ALTER TABLE owner_reports ADD COLUMN content_hash TEXT")
+    # Carry on from references issued before ref_seq existed, which used
+    # random suffixes, so the counter can't hand out one already taken.
+    db.execute("""
+        INSERT OR IGNORE INTO ref_seq (day, n)
+        SELECT substr(reference_number, 9, 8), MAX(CAST(substr(reference_number, 18) AS INTEGER))
+        FROM inspections
+        WHERE reference_number LIKE 'GCC-FHI-%'
+        GROUP BY 1
+    """)
+    # Due-inspection query: matches its WHERE and ORDER BY, so rows come
+    # back already sorted and out-of-window rows are rejected from the
+    # index without reading the table.
+    db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_premises_due_rank
+            ON premises(approval_status, risk_rank, next_inspection_due)
+    """)
+    # Give the planner statistics on first run; PRAGMA optimize in
+    # warm_cache() keeps them current afterwards.
+    has_stats = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+    ).fetchone()
+    if not has_stats:
+        db.execute("ANALYZE")
+    db.execute(f"PRAGMA user_version={_SCHEMA_VERSION}")
+
+
+def _to_json(value):
+    """
+    Serialise ``value`` as JSON text. Kept as text rather than orjson's
+    bytes because SQLite's JSON functions reject BLOB arguments.
+    """
+    return orjson.dumps(value).decode()
 
 
 def _row_to_dict(row):
@@ -151,132 +425,300 @@ def _rows_to_dicts(rows):
 # ── Premises ─────────────────────────────────────────────────────────────
 
 
+# Columns written by import_premises, in parameter order. synced_at and
+# updated_at are not listed here; import_premises binds one timestamp for
+# both after these columns.
+_PREMISES_IMPORT_COLUMNS = (
+    "premises_ref", "uprn", "business_name", "trading_name", "business_type",
+    "business_type_detail", "food_business_operator", "address_line1",
+    "address_line2", "town", "county", "postcode", "telephone", "email",
+    "number_of_food_handlers", "risk_category", "current_fhrs_rating",
+    "registration_date", "last_inspection_date", "last_hygienic_score",
+    "last_structure_score", "last_management_score", "next_inspection_due",
+    "trading_hours", "water_supply", "approval_status", "allergen_documentation",
+    "haccp_in_place", "primary_authority", "notes",
+)
+
+# Upsert in place rather than INSERT OR REPLACE, which deletes and
+# re-inserts the row (and re-checks every child foreign key). synced_at
+# and updated_at are bound as the last two parameters.
+_PREMISES_UPSERT_SQL = """
+    INSERT INTO premises ({columns}, synced_at, updated_at)
+    VALUES ({params}, ?, ?)
+    ON CONFLICT(premises_ref) DO UPDATE SET
+        {updates},
+        synced_at = excluded.synced_at,
+        updated_at = excluded.updated_at
+""".format(
+    columns=", ".join(_PREMISES_IMPORT_COLUMNS),
+    params=", ".join("?" for _ in _PREMISES_IMPORT_COLUMNS),
+    updates=",\n        ".join(
+        f"{col} = excluded.{col}" for col in _PREMISES_IMPORT_COLUMNS[1:]
+    ),
+)
+
+# Rows per executemany call, to bound how much each batch adds to the WAL.
+_IMPORT_BATCH_SIZE = 5000
+
+
+def _premises_row(p):
+    """Map a sample-premises.json record to a premises row tuple."""
+    # Bound methods hoisted out of the tuple; this runs for every record
+    # in a sync.
+    get = p.get
+    score = (get("lastInspectionScores") or {}).get
+    address = (get("address") or {}).get
+    return (
+        get("premisesRef"),
+        get("uprn"),
+        get("businessName"),
+        get("tradingName") or get("businessName"),
+        get("businessType"),
+        get("businessTypeDetail"),
+        get("foodBusinessOperator"),
+        address("line1", ""),
+        address("line2", ""),
+        address("town", "Gloucester"),
+        address("county", "Gloucestershire"),
+        address("postcode", ""),
+        get("telephone"),
+        get("email"),
+        get("numberOfFoodHandlers", 0),
+        get("riskCategory", "C"),
+        get("currentFhrsRating"),
+        get("registrationDate"),
+        get("lastInspectionDate"),
+        score("hygienicFoodHandling"),
+        score("structureAndCleaning"),
+        score("managementOfFoodSafety"),
+        get("nextInspectionDue"),
+        get("tradingHours"),
+        get("waterSupply", "Mains"),
+        get("approvalStatus", "Registered"),
+        1 if get("allergenDocumentation") else 0,
+        1 if get("haccpInPlace") else 0,
+        get("primaryAuthority"),
+        get("notes"),
+    )
+
+
 def import_premises(premises_list):
     """
     Import premises from Uniform connector data (or sample data) into local cache.
     Accepts a list of dicts in the sample-premises.json format.
+    All rows are written in one transaction, in batches of executemany.
     """
-    db = get_db()
-
-    for p in premises_list:
-        scores = p.get("lastInspectionScores") or {}
-        address = p.get("address") or {}
-
-        db.execute("""
-            INSERT OR REPLACE INTO premises (
-                premises_ref, uprn, business_name, trading_name, business_type,
-                business_type_detail, food_business_operator, address_line1,
-                address_line2, town, county, postcode, telephone, email,
-                number_of_food_handlers, risk_category, current_fhrs_rating,
-                registration_date, last_inspection_date, last_hygienic_score,
-                last_structure_score, last_management_score, next_inspection_due,
-                trading_hours, water_supply, approval_status, allergen_documentation,
-                haccp_in_place, primary_authority, notes, synced_at, updated_at
-            ) VALUES (
-                ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
-                ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'), datetime('now')
-            )
-        """, (
-            p.get("premisesRef"),
-            p.get("uprn"),
-            p.get("businessName"),
-            p.get("tradingName") or p.get("businessName"),
-            p.get("businessType"),
-            p.get("businessTypeDetail"),
-            p.get("foodBusinessOperator"),
-            address.get("line1", ""),
-            address.get("line2", ""),
-            address.get("town", "Gloucester"),
-            address.get("county", "Gloucestershire"),
-            address.get("postcode", ""),
-            p.get("telephone"),
-            p.get("email"),
-            p.get("numberOfFoodHandlers", 0),
-            p.get("riskCategory", "C"),
-            p.get("currentFhrsRating"),
-            p.get("registrationDate"),
-            p.get("lastInspectionDate"),
-            scores.get("hygienicFoodHandling"),
-            scores.get("structureAndCleaning"),
-            scores.get("managementOfFoodSafety"),
-            p.get("nextInspectionDue"),
-            p.get("tradingHours"),
-            p.get("waterSupply", "Mains"),
-            p.get("approvalStatus", "Registered"),
-            1 if p.get("allergenDocumentation") else 0,
-            1 if p.get("haccpInPlace") else 0,
-            p.get("primaryAuthority"),
-            p.get("notes"),
-        ))
-
-        # Sync previous actions
-        db.execute(
-            "DELETE FROM previous_actions WHERE premises_ref = ?",
-            (p.get("premisesRef"),)
-        )
-        for action in p.get("previousActions") or []:
+    # One timestamp for the whole import, in datetime('now') format (UTC)
+    # so it sorts alongside values written by the column defaults.
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    stamps = (now, now)
+    with get_write_conn() as db:
+        for start in range(0, len(premises_list), _IMPORT_BATCH_SIZE):
+            batch = premises_list[start:start + _IMPORT_BATCH_SIZE]
+            db.executemany(_PREMISES_UPSERT_SQL, [_premises_row(p) + stamps for p in batch])
+
+            # Replace the batch's previous actions wholesale
+            refs = [p.get("premisesRef") for p in batch]
             db.execute(
+                "DELETE FROM previous_actions WHERE premises_ref IN (SELECT value FROM json_each(?))",
+                (_to_json(refs),),
+            )
+            db.executemany(
                 "INSERT INTO previous_actions (premises_ref, action_date, action_type, detail) VALUES (?, ?, ?, ?)",
-                (p.get("premisesRef"), action.get("date"), action.get("type"), action.get("detail")),
+                [
+                    (p.get("premisesRef"), action.get("date"), action.get("type"), action.get("detail"))
+                    for p in batch
+                    for action in p.get("previousActions") or []
+                ],
             )
 
-    db.commit()
     return len(premises_list)
 
 
+# Columns returned for a premises row. risk_rank is left out: it only
+# exists to order and index the due list, and isn't part of the API.
+_PREMISES_FIELDS = _PREMISES_IMPORT_COLUMNS + ("synced_at", "updated_at")
+_PREMISES_PROJECTION = ", ".join(_PREMISES_FIELDS)
+
+# Columns that may be requested from get_all_premises().
+PREMISES_COLUMNS = frozenset(_PREMISES_FIELDS)
+
+# Premises due an inspection within the period bound as the single
+# "+N months" parameter; shared by the due list and the workload counts.
+_DUE_WHERE_SQL = """approval_status = 'Registered'
+              AND (next_inspection_due <= date('now', 'localtime', ?)
+                   OR next_inspection_due IS NULL)"""
+
+
 def get_premises_due_inspection(within_months=6):
     """Get all premises due for inspection within the next N months."""
-    db = get_db()
-    now = datetime.now()
-    cutoff_year = now.year
-    cutoff_month = now.month + within_months
-    while cutoff_month > 12:
-        cutoff_month -= 12
-        cutoff_year += 1
-    cutoff_str = f"{cutoff_year:04d}-{cutoff_month:02d}-{now.day:02d}"
-
-    rows = db.execute("""
-        SELECT * FROM premises
-        WHERE approval_status = 'Registered'
-          AND (next_inspection_due <= ? OR next_inspection_due IS NULL)
-        ORDER BY
-          CASE risk_category
-            WHEN 'A' THEN 1
-            WHEN 'B' THEN 2
-            WHEN 'C' THEN 3
-            WHEN 'D' THEN 4
-            WHEN 'E' THEN 5
-            ELSE 6
-          END,
-          next_inspection_due ASC
-    """, (cutoff_str,)).fetchall()
+    # SQLite's date modifiers handle month lengths (e.g. 31 March + 6 months)
+    # which hand-built YYYY-MM-DD strings got wrong.
+    months_modifier = f"{int(within_months):+d} months"
+
+    with get_read_conn() as db:
+        rows = db.execute(f"""
+            SELECT {_PREMISES_PROJECTION} FROM premises
+            WHERE {_DUE_WHERE_SQL}
+            ORDER BY risk_rank, next_inspection_due ASC
+        """, (months_modifier,)).fetchall()
     return _rows_to_dicts(rows)
 
 
-def get_all_premises():
-    """Get all premises ordered by name."""
-    db = get_db()
-    rows = db.execute("SELECT * FROM premises ORDER BY business_name").fetchall()
+def get_workload_counts(within_months=6, revisit_action_types=()):
+    """
+    Aggregate the premises due within the next N months without loading
+    them: one row per (risk_category, business_type, month) with its
+    count and how many are overdue, never inspected, or have a previous
+    action in ``revisit_action_types``.
+    """
+    months_modifier = f"{int(within_months):+d} months"
+    with get_read_conn() as db:
+        rows = db.execute(f"""
+            SELECT
+              risk_category,
+              business_type,
+              substr(next_inspection_due, 1, 7) AS month,
+              COUNT(*) AS n,
+              SUM(next_inspection_due IS NOT NULL
+                  AND next_inspection_due <= date('now', 'localtime')) AS overdue,
+              SUM(COALESCE(last_inspection_date, '') = '') AS new_business,
+              SUM(EXISTS (
+                SELECT 1 FROM previous_actions a
+                WHERE a.premises_ref = premises.premises_ref
+                  AND a.action_type IN (SELECT value FROM json_each(?))
+              )) AS revisit
+            FROM premises
+            WHERE {_DUE_WHERE_SQL}
+            GROUP BY 1, 2, 3
+        """, (_to_json(list(revisit_action_types)), months_modifier)).fetchall()
     return _rows_to_dicts(rows)
 
 
+def get_all_premises(columns=None):
+    """
+    Get all premises ordered by name. ``columns`` restricts the result to
+    the given premises columns, so list views don't load every field.
+    """
+    if columns:
+        unknown = set(columns) - PREMISES_COLUMNS
+        if unknown:
+            raise ValueError(f"Unknown premises fields: {', '.join(sorted(unknown))}")
+        projection = ", ".join(columns)
+    else:
+        projection = _PREMISES_PROJECTION
+    with get_read_conn() as db:
+        rows = db.execute(f"SELECT {projection} FROM premises ORDER BY business_name").fetchall()
+        return _rows_to_dicts(rows)
+
+
+def get_premises_stats():
+    """
+    Premises count and when premises were last synced, in one query. A
+    sync that changes nothing rewrites no premises rows, so the time comes
+    from sync_state; MAX(synced_at) only covers caches synced before it
+    was recorded there.
+    """
+    with get_read_conn() as db:
+        row = db.execute("""
+            SELECT COUNT(*) AS premises,
+                   COALESCE((SELECT value FROM sync_state WHERE key = ?),
+                            MAX(synced_at)) AS last_synced_at
+            FROM premises
+        """, (LAST_SYNCED_KEY,)).fetchone()
+        return {"premises": row["premises"], "lastSyncedAt": row["last_synced_at"]}
+
+
 def get_premises(premises_ref):
     """Get a single premises by reference."""
-    db = get_db()
-    row = db.execute(
-        "SELECT * FROM premises WHERE premises_ref = ?", (premises_ref,)
-    ).fetchone()
-    return _row_to_dict(row)
+    with get_read_conn() as db:
+        row = db.execute(
+            f"SELECT {_PREMISES_PROJECTION} FROM premises WHERE premises_ref = ?", (premises_ref,)
+        ).fetchone()
+        return _row_to_dict(row)
+
+
+def get_premises_detail(premises_ref):
+    """
+    Get a premises with its previous actions and inspections, read on one
+    connection in a single snapshot. Returns None if it doesn't exist.
+    """
+    with get_read_conn() as db:
+        db.execute("BEGIN")
+        try:
+            premises = _row_to_dict(db.execute(
+                f"SELECT {_PREMISES_PROJECTION} FROM premises WHERE premises_ref = ?", (premises_ref,)
+            ).fetchone())
+            if premises is None:
+                return None
+            premises["previousActions"] = _rows_to_dicts(db.execute(
+                "SELECT * FROM previous_actions WHERE premises_ref = ? ORDER BY action_date DESC",
+                (premises_ref,),
+            ).fetchall())
+            premises["inspections"] = _rows_to_dicts(db.execute(
+                "SELECT * FROM inspections WHERE premises_ref = ? ORDER BY inspection_date DESC",
+                (premises_ref,),
+            ).fetchall())
+            return premises
+        finally:
+            db.execute("COMMIT")
 
 
 def get_previous_actions(premises_ref):
     """Get previous enforcement actions for a premises."""
-    db = get_db()
-    rows = db.execute(
-        "SELECT * FROM previous_actions WHERE premises_ref = ? ORDER BY action_date DESC",
-        (premises_ref,),
-    ).fetchall()
-    return _rows_to_dicts(rows)
+    with get_read_conn() as db:
+        rows = db.execute(
+            "SELECT * FROM previous_actions WHERE premises_ref = ? ORDER BY action_date DESC",
+            (premises_ref,),
+        ).fetchall()
+        return _rows_to_dicts(rows)
+
+
+def get_previous_actions_by_premises(premises_refs):
+    """
+    Get previous enforcement actions for several premises in one query.
+    Returns a dict of premises_ref -> list of actions, newest first; every
+    requested ref is present, with an empty list if it has no actions.
+    """
+    actions = {ref: [] for ref in premises_refs}
+    with get_read_conn() as db:
+        rows = db.execute("""
+            SELECT * FROM previous_actions
+            WHERE premises_ref IN (SELECT value FROM json_each(?))
+            ORDER BY premises_ref, action_date DESC
+        """, (_to_json(list(actions)),)).fetchall()
+    for row in rows:
+        actions[row["premises_ref"]].append(dict(row))
+    return actions
+
+
+# ── Sync State ───────────────────────────────────────────────────────────
+
+# sync_state key holding when premises were last synced, changed or not.
+LAST_SYNCED_KEY = "last_synced_at"
+
+
+def get_sync_state(key):
+    """Get a stored sync checkpoint value, or None if unset."""
+    with get_read_conn() as db:
+        row = db.execute(
+            "SELECT value FROM sync_state WHERE key = ?", (key,)
+        ).fetchone()
+    return row["value"] if row else None
+
+
+def set_sync_state(key, value):
+    """Store a sync checkpoint value."""
+    with get_write_conn() as db:
+        db.execute(
+            "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+            (key, value),
+        )
+
+
+def mark_premises_synced():
+    """Record now (UTC, in datetime('now') format) as the last premises sync."""
+    set_sync_state(LAST_SYNCED_KEY, datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"))
 
 
 # ── Inspections ──────────────────────────────────────────────────────────
@@ -284,84 +726,102 @@ def get_previous_actions(premises_ref):
 
 def create_inspection(data):
     """Create a new scheduled inspection."""
-    db = get_db()
     now_str = datetime.now().strftime("%Y%m%d")
-    ref_num = f"GCC-FHI-{now_str}-{random.randint(0, 9999):04d}"
-
-    cursor = db.execute("""
-        INSERT INTO inspections (
-            premises_ref, reference_number, inspection_date, inspection_time,
-            inspection_type, inspector_name, inspector_id, status
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, 'scheduled')
-    """, (
-        data.get("premisesRef"),
-        ref_num,
-        data.get("inspectionDate"),
-        data.get("inspectionTime"),
-        data.get("inspectionType", "routine"),
-        data.get("inspectorName"),
-        data.get("inspectorId"),
-    ))
-    db.commit()
-    return {"id": cursor.lastrowid, "referenceNumber": ref_num}
+
+    with get_write_conn() as db:
+        # Per-day counter, so references never collide with each other.
+        seq = db.execute("""
+            INSERT INTO ref_seq (day, n) VALUES (?, 1)
+            ON CONFLICT(day) DO UPDATE SET n = n + 1
+            RETURNING n
+        """, (now_str,)).fetchone()[0]
+        ref_num = f"GCC-FHI-{now_str}-{seq:04d}"
+        cursor = db.execute("""
+            INSERT INTO inspections (
+                premises_ref, reference_number, inspection_date, inspection_time,
+                inspection_type, inspector_name, inspector_id, status
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, 'scheduled')
+        """, (
+            data.get("premisesRef"),
+            ref_num,
+            data.get("inspectionDate"),
+            data.get("inspectionTime"),
+            data.get("inspectionType", "routine"),
+            data.get("inspectorName"),
+            data.get("inspectorId"),
+        ))
+        return {"id": cursor.lastrowid, "referenceNumber": ref_num}
 
 
 def get_inspection(inspection_id):
     """Get an inspection record by ID."""
-    db = get_db()
-    row = db.execute(
-        "SELECT * FROM inspections WHERE id = ?", (inspection_id,)
-    ).fetchone()
-    return _row_to_dict(row)
+    with get_read_conn() as db:
+        row = db.execute(
+            "SELECT * FROM inspections WHERE id = ?", (inspection_id,)
+        ).fetchone()
+        return _row_to_dict(row)
 
 
 def get_inspections_for_premises(premises_ref):
     """Get all inspections for a premises."""
-    db = get_db()
-    rows = db.execute(
-        "SELECT * FROM inspections WHERE premises_ref = ? ORDER BY inspection_date DESC",
-        (premises_ref,),
-    ).fetchall()
-    return _rows_to_dicts(rows)
+    with get_read_conn() as db:
+        rows = db.execute(
+            "SELECT * FROM inspections WHERE premises_ref = ? ORDER BY inspection_date DESC",
+            (premises_ref,),
+        ).fetchall()
+        return _rows_to_dicts(rows)
+
+
+def count_inspections_by_premises(premises_refs):
+    """Count recorded inspections for several premises in one query."""
+    counts = {ref: 0 for ref in premises_refs}
+    with get_read_conn() as db:
+        rows = db.execute("""
+            SELECT premises_ref, COUNT(*) AS n FROM inspections
+            WHERE premises_ref IN (SELECT value FROM json_each(?))
+            GROUP BY premises_ref
+        """, (_to_json(list(counts)),)).fetchall()
+    for row in rows:
+        counts[row["premises_ref"]] = row["n"]
+    return counts
 
 
 def complete_inspection(inspection_id, results):
     """Update an inspection with completion results."""
-    db = get_db()
     total = (
         (results.get("hygienicScore") or 0)
         + (results.get("structureScore") or 0)
         + (results.get("managementScore") or 0)
     )
-    db.execute("""
-        UPDATE inspections SET
-            hygienic_score = ?,
-            structure_score = ?,
-            management_score = ?,
-            total_score = ?,
-            fhrs_rating = ?,
-            enforcement_actions = ?,
-            actions_required = ?,
-            revisit_required = ?,
-            revisit_date = ?,
-            additional_notes = ?,
-            status = 'completed',
-            completed_at = datetime('now')
-        WHERE id = ?
-    """, (
-        results.get("hygienicScore"),
-        results.get("structureScore"),
-        results.get("managementScore"),
-        total,
-        results.get("fhrsRating"),
-        results.get("enforcementActions"),
-        results.get("actionsRequired"),
-        1 if results.get("revisitRequired") else 0,
-        results.get("revisitDate"),
-        results.get("additionalNotes"),
-        inspection_id,
-    ))
-    db.commit()
+    with get_write_conn() as db:
+        db.execute("""
+            UPDATE inspections SET
+                hygienic_score = ?,
+                structure_score = ?,
+                management_score = ?,
+                total_score = ?,
+                fhrs_rating = ?,
+                enforcement_actions = ?,
+                actions_required = ?,
+                revisit_required = ?,
+                revisit_date = ?,
+                additional_notes = ?,
+                status = 'completed',
+                completed_at = datetime('now')
+            WHERE id = ?
+        """, (
+            results.get("hygienicScore"),
+            results.get("structureScore"),
+            results.get("managementScore"),
+            total,
+            results.get("fhrsRating"),
+            results.get("enforcementActions"),
+            results.get("actionsRequired"),
+            1 if results.get("revisitRequired") else 0,
+            results.get("revisitDate"),
+            results.get("additionalNotes"),
+            inspection_id,
+        ))
 
 
 # ── Visit Sheets & Reports ──────────────────────────────────────────────
@@ -369,47 +829,53 @@ def complete_inspection(inspection_id, results):
 
 def save_visit_sheet(inspection_id, premises_ref, sheet_data):
     """Save a generated visit sheet."""
-    db = get_db()
-    cursor = db.execute(
-        "INSERT INTO visit_sheets (inspection_id, premises_ref, sheet_data) VALUES (?, ?, ?)",
-        (inspection_id, premises_ref, json.dumps(sheet_data)),
-    )
-    db.commit()
-    return cursor.lastrowid
+    with get_write_conn() as db:
+        cursor = db.execute(
+            "INSERT INTO visit_sheets (inspection_id, premises_ref, sheet_data) VALUES (?, ?, ?)",
+            (inspection_id, premises_ref, _to_json(sheet_data)),
+        )
+        return cursor.lastrowid
 
 
 def get_visit_sheet(inspection_id):
     """Get visit sheet for an inspection."""
-    db = get_db()
-    row = db.execute(
-        "SELECT * FROM visit_sheets WHERE inspection_id = ?", (inspection_id,)
-    ).fetchone()
-    return _row_to_dict(row)
+    with get_read_conn() as db:
+        row = db.execute(
+            "SELECT * FROM visit_sheets WHERE inspection_id = ?", (inspection_id,)
+        ).fetchone()
+        return _row_to_dict(row)
 
 
-def save_owner_report(inspection_id, premises_ref, report_html):
+def save_owner_report(inspection_id, premises_ref, report_html, content_hash=None):
     """Save a generated owner report."""
-    db = get_db()
-    cursor = db.execute(
-        "INSERT INTO owner_reports (inspection_id, premises_ref, report_html) VALUES (?, ?, ?)",
-        (inspection_id, premises_ref, report_html),
-    )
-    db.commit()
-    return cursor.lastrowid
+    with get_write_conn() as db:
+        cursor = db.execute("""
+            INSERT INTO owner_reports (inspection_id, premises_ref, report_html, content_hash)
+            VALUES (?, ?, ?, ?)
+        """, (inspection_id, premises_ref, report_html, content_hash))
+        return cursor.lastrowid
 
 
 def get_owner_report(inspection_id):
-    """Get owner report for an inspection."""
-    db = get_db()
-    row = db.execute(
-        "SELECT * FROM owner_reports WHERE inspection_id = ?", (inspection_id,)
-    ).fetchone()
-    return _row_to_dict(row)
+    """Get the most recently generated owner report for an inspection."""
+    with get_read_conn() as db:
+        row = db.execute(
+            "SELECT * FROM owner_reports WHERE inspection_id = ? ORDER BY id DESC LIMIT 1",
+            (inspection_id,),
+        ).fetchone()
+        return _row_to_dict(row)
 
 
 def close():
-    """Close the database connection."""
-    global _db
-    if _db is not None:
-        _db.close()
-        _db = None
+    """Close all pooled database connections."""
+    global _write_pool, _read_pool
+    _maintenance_stop.set()
+    with _pool_lock:
+        if _write_pool is not None and not _write_pool.empty():
+            # Let SQLite record any planner statistics it gathered this run.
+            _write_pool.queue[0].execute("PRAGMA optimize")
+        for pool in (_write_pool, _read_pool):
+            while pool is not None and not pool.empty():
+                pool.get_nowait().close()
+        _write_pool = None
+        _read_pool = None
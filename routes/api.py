@@ -9,7 +9,15 @@ Provides REST endpoints for:
   - System status and Uniform connector health
   - SOAP licence lookups
 """
-from flask import Blueprint, request, jsonify
+import functools
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from flask import Blueprint, Response, current_app, make_response, request, jsonify, send_file
 
 import database
 from services import inspection_scheduler as scheduler
@@ -19,23 +27,117 @@ from services import uniform_sync
 
 api = Blueprint("api", __name__)
 
+# Runs the Uniform connection probe for /status alongside the local reads.
+_status_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="status-probe")
+
+# Rendered responses of read-only endpoints, keyed by request path and query
+# string. Entries are only valid for the database.data_version() they were
+# built from and are dropped when it changes.
+_RESPONSE_CACHE_SIZE = 256
+_response_cache = OrderedDict()
+_response_cache_version = None
+_response_cache_lock = threading.Lock()
+
+# Responses smaller than this aren't worth compressing.
+_GZIP_MIN_SIZE = 1024
+_GZIP_LEVEL = 6
+
+
+def _gzip(data):
+    compressor = zlib.compressobj(_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _gzip_stream(chunks):
+    """Gzip an iterable of str chunks incrementally, yielding bytes."""
+    compressor = zlib.compressobj(_GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _cached(*query_args):
+    """
+    Serve repeat requests for a read-only endpoint from memory, with an
+    ETag so unchanged responses can be answered with 304 Not Modified.
+    Only successful responses are cached. The key is the path plus the
+    named ``query_args`` the view reads, so unrelated or reordered query
+    parameters share an entry. The date is part of the key because the
+    scheduling views count days from today. Larger bodies are gzipped
+    once when cached and sent compressed to clients that accept it.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            global _response_cache_version
+            version = database.data_version()
+            key = (
+                date.today().isoformat(),
+                request.path,
+                tuple(request.args.get(name) for name in query_args),
+            )
+            with _response_cache_lock:
+                if _response_cache_version != version:
+                    _response_cache.clear()
+                    _response_cache_version = version
+                entry = _response_cache.get(key)
+                if entry is not None:
+                    _response_cache.move_to_end(key)
+
+            if entry is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                gzipped = _gzip(body) if len(body) >= _GZIP_MIN_SIZE else None
+                entry = (body, gzipped, response.mimetype, hashlib.blake2b(body, digest_size=16).hexdigest())
+                with _response_cache_lock:
+                    if _response_cache_version == version:
+                        _response_cache[key] = entry
+                        while len(_response_cache) > _RESPONSE_CACHE_SIZE:
+                            _response_cache.popitem(last=False)
+
+            body, gzipped, mimetype, etag = entry
+            if gzipped is not None and "gzip" in request.accept_encodings:
+                response = current_app.response_class(gzipped, mimetype=mimetype)
+                response.headers["Content-Encoding"] = "gzip"
+                # A strong ETag identifies the exact bytes sent.
+                etag = f"{etag}-gz"
+            else:
+                response = current_app.response_class(body, mimetype=mimetype)
+            response.vary.add("Accept-Encoding")
+            response.set_etag(etag)
+            return response.make_conditional(request)
+
+        return wrapper
+
+    return decorator
+
 
 # -- System Status ---------------------------------------------------------
 
 @api.route("/status")
 def status():
     """System health check and Uniform SOAP connector status."""
-    conn_status = uniform_sync.get_connection_status()
+    # The SOAP probe is network-bound; run it while the local reads happen.
+    probe = _status_executor.submit(uniform_sync.get_connection_status)
+    database_status = {"connected": True, **database.get_premises_stats()}
+    sync_status = uniform_sync.get_sync_status()
     return jsonify({
         "status": "operational",
-        "uniformConnector": conn_status,
-        "database": {"connected": True},
+        "uniformConnector": probe.result(),
+        "database": database_status,
+        "sync": sync_status,
     })
 
 
 @api.route("/sync", methods=["POST"])
 def sync():
     """Trigger a sync of premises data from the Uniform connector."""
+    # A manual sync is a retry, so don't trust a cached connection failure.
+    uniform_sync.reset_connection_cache()
     try:
         result = uniform_sync.sync_premises()
         return jsonify({"success": True, **result})
@@ -46,35 +148,45 @@ def sync():
 # -- Premises --------------------------------------------------------------
 
 @api.route("/premises")
+@_cached("fields")
 def list_premises():
-    """List all registered food premises."""
-    premises = database.get_all_premises()
+    """
+    List all registered food premises. An optional ``fields`` query
+    parameter (comma-separated column names) limits the columns returned.
+    """
+    fields = request.args.get("fields")
+    columns = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    try:
+        premises = database.get_all_premises(columns)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
     return jsonify({"count": len(premises), "data": premises})
 
 
 @api.route("/premises/<path:ref>")
+@_cached()
 def get_premises(ref):
     """Get detailed information for a single premises."""
-    premises = database.get_premises(ref)
+    premises = database.get_premises_detail(ref)
     if not premises:
         return jsonify({"error": "Premises not found"}), 404
-    actions = database.get_previous_actions(ref)
-    inspections = database.get_inspections_for_premises(ref)
-    return jsonify({**premises, "previousActions": actions, "inspections": inspections})
+    return jsonify(premises)
 
 
 # -- Inspection Scheduling -------------------------------------------------
 
 @api.route("/inspections/due")
+@_cached("months")
 def inspections_due():
     """Get all premises due for inspection within the next N months."""
     months = request.args.get("months", 6, type=int)
     scheduled = scheduler.get_scheduled_inspections(months)
-    summary = scheduler.get_workload_summary(months)
+    summary = scheduler.get_workload_summary(months, scheduled)
     return jsonify({"summary": summary, "inspections": scheduled})
 
 
 @api.route("/inspections/workload")
+@_cached("months")
 def inspections_workload():
     """Get workload summary statistics."""
     months = request.args.get("months", 6, type=int)
@@ -93,6 +205,7 @@ def create_inspection():
 
 
 @api.route("/inspections/<int:inspection_id>")
+@_cached()
 def get_inspection(inspection_id):
     """Get an inspection by ID."""
     inspection = database.get_inspection(inspection_id)
@@ -129,8 +242,28 @@ def batch_visit_sheets():
     """Generate visit sheets for all premises due inspection."""
     months = request.args.get("months", 6, type=int)
     options = dict(request.args)
-    sheets = visit_sheet.generate_batch_visit_sheets(months, options)
-    return jsonify({"count": len(sheets), "sheets": sheets})
+    sheets = visit_sheet.iter_batch_visit_sheets(months, options)
+    dumps = current_app.json.dumps
+
+    # Stream the sheets as they are built instead of materialising the
+    # whole batch; the count is only known at the end, so it comes last.
+    def generate():
+        count = 0
+        yield '{"sheets": ['
+        for sheet in sheets:
+            if count:
+                yield ", "
+            yield dumps(sheet)
+            count += 1
+        yield f'], "count": {count}}}'
+
+    if "gzip" in request.accept_encodings:
+        response = Response(_gzip_stream(generate()), mimetype="application/json")
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = Response(generate(), mimetype="application/json")
+    response.vary.add("Accept-Encoding")
+    return response
 
 
 # -- Owner Reports ---------------------------------------------------------
@@ -146,6 +279,7 @@ def create_report(inspection_id):
 
 
 @api.route("/reports/<int:inspection_id>")
+@_cached()
 def get_report(inspection_id):
     """Get a previously generated owner report."""
     report = database.get_owner_report(inspection_id)
@@ -156,16 +290,48 @@ def get_report(inspection_id):
 
 @api.route("/reports/<int:inspection_id>/html")
 def get_report_html(inspection_id):
-    """Render the owner report as HTML (for printing/preview)."""
+    """
+    Render the owner report as HTML (for printing/preview). The rendering
+    is kept on disk until the report's data changes, so repeat views are
+    sent straight from the file, already gzipped if the client accepts it.
+    The report's date and generated stamp are those of that rendering.
+    """
     try:
-        html = report_generator.generate_owner_report(inspection_id)
-        return html, 200, {"Content-Type": "text/html"}
+        # A concurrent change to the report's data can replace the file
+        # between finding and opening it; look it up again if so.
+        for _ in range(3):
+            path = report_generator.current_report_file(inspection_id)
+            try:
+                response = _send_report_file(path)
+            except FileNotFoundError:
+                continue
+            response.vary.add("Accept-Encoding")
+            return response
+        return jsonify({"error": "Report is being regenerated, please retry"}), 503
     except ValueError as exc:
         return jsonify({"error": str(exc)}), 404
 
 
+def _send_report_file(path):
+    if "gzip" in request.accept_encodings:
+        try:
+            response = send_file(f"{path}.gz", mimetype="text/html", conditional=True)
+        except FileNotFoundError:
+            pass
+        else:
+            response.headers["Content-Encoding"] = "gzip"
+            return response
+    return send_file(path, mimetype="text/html", conditional=True)
+
+
 # -- Uniform SOAP Operations -----------------------------------------------
 
+@api.route("/uniform/status")
+def sync_status():
+    """Report whether a premises sync is in progress and its last result."""
+    return jsonify(uniform_sync.get_sync_status())
+
+
 @api.route("/uniform/licence/<path:reference>")
 def lookup_licence(reference):
     """Look up a licence in Uniform by reference value."""
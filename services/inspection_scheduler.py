@@ -18,28 +18,47 @@ Premises are ranked by a composite priority score that considers:
   4. Previous FHRS rating (lower rated premises get higher priority)
   5. Whether the business is newly registered (first inspection)
 """
+from collections import Counter
 from datetime import datetime
+from operator import itemgetter
 
 import config
 import database
 
+# Priority score weightings (lower score = inspect sooner)
+_RISK_WEIGHTS = {"A": 0, "B": 10, "C": 20, "D": 30, "E": 40}
+_ACTION_WEIGHTS = {
+    "Emergency Prohibition Notice": 20,
+    "Hygiene Improvement Notice": 15,
+    "Written Warning": 5,
+}
+_REVISIT_ACTIONS = frozenset(("Hygiene Improvement Notice", "Emergency Prohibition Notice"))
 
-def calculate_priority_score(premises):
+# Fields read by get_workload_summary(); every scheduled item has them all.
+_SUMMARY_FIELDS = itemgetter(
+    "isOverdue", "isNewBusiness", "requiresRevisit",
+    "risk_category", "business_type", "next_inspection_due",
+)
+
+
+def calculate_priority_score(premises, actions=None, now=None):
     """
     Calculate a numeric priority score for a premises.
     Lower numbers = higher priority (should be inspected sooner).
+
+    ``actions`` are the premises' previous enforcement actions; they are
+    looked up if not supplied. ``now`` lets a batch share one timestamp.
     """
     score = 0
-    now = datetime.now()
+    now = now or datetime.now()
 
     # 1. Risk category weighting (0-50 points)
-    risk_weights = {"A": 0, "B": 10, "C": 20, "D": 30, "E": 40}
-    score += risk_weights.get(premises.get("risk_category"), 25)
+    score += _RISK_WEIGHTS.get(premises.get("risk_category"), 25)
 
     # 2. Overdue penalty
     next_due = premises.get("next_inspection_due")
     if next_due:
-        due_date = datetime.strptime(next_due, "%Y-%m-%d")
+        due_date = datetime.fromisoformat(next_due)
         days_until_due = (due_date - now).days
         if days_until_due < 0:
             score += max(-50, days_until_due / 3)
@@ -49,17 +68,12 @@ def calculate_priority_score(premises):
         score -= 20
 
     # 3. Previous enforcement history
-    actions = database.get_previous_actions(premises["premises_ref"])
+    if actions is None:
+        actions = database.get_previous_actions(premises["premises_ref"])
     if actions:
         score -= 10 * min(len(actions), 3)
         for action in actions:
-            atype = action.get("action_type", "")
-            if atype == "Emergency Prohibition Notice":
-                score -= 20
-            elif atype == "Hygiene Improvement Notice":
-                score -= 15
-            elif atype == "Written Warning":
-                score -= 5
+            score -= _ACTION_WEIGHTS.get(action.get("action_type", ""), 0)
 
     # 4. Previous FHRS rating (lower rating = higher priority)
     fhrs = premises.get("current_fhrs_rating")
@@ -81,14 +95,17 @@ def get_scheduled_inspections(within_months=6):
     sorted by priority.
     """
     premises_list = database.get_premises_due_inspection(within_months)
+    actions_by_ref = database.get_previous_actions_by_premises(
+        [p["premises_ref"] for p in premises_list]
+    )
     scheduled = []
 
     now = datetime.now()
     for p in premises_list:
-        priority = calculate_priority_score(p)
-        actions = database.get_previous_actions(p["premises_ref"])
+        actions = actions_by_ref[p["premises_ref"]]
+        priority = calculate_priority_score(p, actions, now)
         due_date_str = p.get("next_inspection_due")
-        due_date = datetime.strptime(due_date_str, "%Y-%m-%d") if due_date_str else None
+        due_date = datetime.fromisoformat(due_date_str) if due_date_str else None
         is_overdue = due_date is not None and due_date < now
         days_until_due = (due_date - now).days if due_date else None
 
@@ -103,10 +120,7 @@ def get_scheduled_inspections(within_months=6):
             "intervalDescription": interval["description"] if interval else "Unknown",
             "inspectionIntervalMonths": interval["months"] if interval else 18,
             "isNewBusiness": not p.get("last_inspection_date"),
-            "requiresRevisit": any(
-                a.get("action_type") in ("Hygiene Improvement Notice", "Emergency Prohibition Notice")
-                for a in actions
-            ),
+            "requiresRevisit": any(a.get("action_type") in _REVISIT_ACTIONS for a in actions),
         })
         scheduled.append(item)
 
@@ -114,30 +128,46 @@ def get_scheduled_inspections(within_months=6):
     return scheduled
 
 
-def get_workload_summary(within_months=6):
-    """Get a summary of the inspection workload."""
-    scheduled = get_scheduled_inspections(within_months)
+def get_workload_summary(within_months=6, scheduled=None):
+    """
+    Get a summary of the inspection workload.
+
+    Callers that already hold the result of get_scheduled_inspections()
+    for the same period can pass it as ``scheduled``; otherwise the counts
+    are aggregated in SQL without ranking the premises.
+    """
+    if scheduled is None:
+        return _summarise_counts(database.get_workload_counts(within_months, _REVISIT_ACTIONS))
 
-    summary = {
+    fields = list(map(_SUMMARY_FIELDS, scheduled))
+    # Counter's C counting loop over the extracted columns is faster than
+    # incrementing dicts by hand in a Python loop.
+    return {
         "totalDue": len(scheduled),
-        "overdue": sum(1 for p in scheduled if p["isOverdue"]),
-        "newBusinesses": sum(1 for p in scheduled if p["isNewBusiness"]),
-        "requiresRevisit": sum(1 for p in scheduled if p["requiresRevisit"]),
-        "byRiskCategory": {},
-        "byBusinessType": {},
-        "byMonth": {},
+        "overdue": sum(f[0] for f in fields),
+        "newBusinesses": sum(f[1] for f in fields),
+        "requiresRevisit": sum(f[2] for f in fields),
+        "byRiskCategory": dict(Counter(f[3] or "Unknown" for f in fields)),
+        "byBusinessType": dict(Counter(f[4] or "Unknown" for f in fields)),
+        "byMonth": dict(Counter(f[5][:7] for f in fields if f[5])),  # YYYY-MM
     }
 
-    for p in scheduled:
-        cat = p.get("risk_category") or "Unknown"
-        summary["byRiskCategory"][cat] = summary["byRiskCategory"].get(cat, 0) + 1
-
-        btype = p.get("business_type") or "Unknown"
-        summary["byBusinessType"][btype] = summary["byBusinessType"].get(btype, 0) + 1
 
-        next_due = p.get("next_inspection_due")
-        if next_due:
-            month = next_due[:7]  # YYYY-MM
-            summary["byMonth"][month] = summary["byMonth"].get(month, 0) + 1
-
-    return summary
+def _summarise_counts(rows):
+    """Fold database.get_workload_counts() rows into the summary shape."""
+    by_risk, by_type, by_month = Counter(), Counter(), Counter()
+    for row in rows:
+        n = row["n"]
+        by_risk[row["risk_category"] or "Unknown"] += n
+        by_type[row["business_type"] or "Unknown"] += n
+        if row["month"]:
+            by_month[row["month"]] += n
+    return {
+        "totalDue": sum(row["n"] for row in rows),
+        "overdue": sum(row["overdue"] for row in rows),
+        "newBusinesses": sum(row["new_business"] for row in rows),
+        "requiresRevisit": sum(row["revisit"] for row in rows),
+        "byRiskCategory": dict(by_risk),
+        "byBusinessType": dict(by_type),
+        "byMonth": dict(by_month),
+    }
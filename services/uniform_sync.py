@@ -8,54 +8,202 @@ When the Uniform SOAP connector is reachable, licensing/premises data
 is fetched from the live system. When offline, the application falls
 back to previously cached data and the sample dataset.
 """
-import json
+import hashlib
 import logging
 import os
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 
+import orjson
+
 from soap_client import UniformSOAPClient
+import config
 import database
 
 logger = logging.getLogger(__name__)
 
 _client = None
+_client_lock = threading.Lock()
+
+# One connector logon shared by concurrent callers. It is reused while it
+# has been idle for less than config.UNIFORM_SESSION_IDLE_TTL seconds and
+# is only logged off once nobody is using it.
+_session_lock = threading.Lock()
+_session_open = False
+_session_users = 0
+_session_last_used = 0.0
+
+# A failed connection probe is remembered for this many seconds, so status
+# polling and syncs don't each wait out the connect timeout while Uniform
+# is down.
+_OFFLINE_STATUS_TTL = 30
+_offline_status = None
+_offline_status_expires = 0.0
+_offline_status_lock = threading.Lock()
+
+# Sync status, shared between the background startup sync and /api/sync.
+_sync_lock = threading.Lock()
+_sync_in_progress = threading.Event()
+_last_sync_result = None
+
+# sync_state key holding a fingerprint per premises record from the last
+# sync; only records whose fingerprint changed are re-imported. Bump the
+# version whenever import_premises() changes how records map to rows, so
+# the next sync rewrites everything.
+_SYNC_CURSOR_KEY = "uniform_cursor"
+_SYNC_CURSOR_VERSION = 2
+# Premises written by one sync above which the WAL is truncated afterwards.
+_CHECKPOINT_AFTER_ROWS = 100
 
 
 def _get_client():
+    """Return the shared Uniform client, so the WSDL is parsed once per process."""
     global _client
     if _client is None:
-        _client = UniformSOAPClient()
+        with _client_lock:
+            if _client is None:
+                _client = UniformSOAPClient()
     return _client
 
 
+@contextmanager
+def _shared_session():
+    """
+    Use the shared connector logon, logging on first if there is none or
+    it has sat idle past its TTL. A stale logon is replaced lazily on the
+    next call rather than by a timer. If a call fails the logon is dropped
+    once idle, in case the connector has expired it.
+    """
+    global _session_open, _session_users, _session_last_used
+    client = _get_client()
+    with _session_lock:
+        idle = time.monotonic() - _session_last_used
+        if _session_open and _session_users == 0 and idle > config.UNIFORM_SESSION_IDLE_TTL:
+            client.logoff()
+            _session_open = False
+        if not _session_open:
+            client.logon()
+            _session_open = True
+        _session_users += 1
+
+    failed = False
+    try:
+        yield client
+    except Exception:
+        failed = True
+        raise
+    finally:
+        with _session_lock:
+            _session_users -= 1
+            _session_last_used = time.monotonic()
+            if failed and _session_users == 0 and _session_open:
+                client.logoff()
+                _session_open = False
+
+
+_SAMPLE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "sample_premises.json"
+)
+# Parsed sample data, reused until the file's mtime or size changes.
+_sample_cache = {"key": None, "data": None}
+_sample_cache_lock = threading.Lock()
+
+
 def _load_sample_data():
     """Load sample premises data from the JSON file."""
-    sample_path = os.path.join(os.path.dirname(__file__), "data", "sample_premises.json")
-    if os.path.exists(sample_path):
-        with open(sample_path, "r") as f:
-            return json.load(f)
-    return []
+    try:
+        st = os.stat(_SAMPLE_PATH)
+    except FileNotFoundError:
+        return []
+    key = (st.st_mtime_ns, st.st_size)
+    with _sample_cache_lock:
+        if _sample_cache["key"] != key:
+            with open(_SAMPLE_PATH, "rb") as f:
+                _sample_cache["data"] = orjson.loads(f.read())
+            _sample_cache["key"] = key
+        return _sample_cache["data"]
+
+
+def _fingerprint(record):
+    encoded = orjson.dumps(record, option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def _store_premises(premises_list):
+    """
+    Write changed premises to the local cache and advance the sync cursor.
+    Everything the sync writes happens inside one BEGIN IMMEDIATE
+    transaction, so a concurrent writer can never force a lock upgrade
+    failure part-way through. The sync time is recorded even when nothing
+    changed. Returns the number of premises written, i.e. new or changed
+    since the last sync.
+    """
+    with database.get_write_conn():
+        cursor = orjson.loads(database.get_sync_state(_SYNC_CURSOR_KEY) or "{}")
+        if cursor.get("version") != _SYNC_CURSOR_VERSION:
+            cursor = {"version": _SYNC_CURSOR_VERSION, "records": {}}
+        seen = cursor["records"]
+
+        changed = []
+        for p in premises_list:
+            ref = p.get("premisesRef")
+            fingerprint = _fingerprint(p)
+            if seen.get(ref) != fingerprint:
+                changed.append(p)
+                seen[ref] = fingerprint
+
+        if changed:
+            database.import_premises(changed)
+            database.set_sync_state(_SYNC_CURSOR_KEY, orjson.dumps(cursor).decode())
+        database.mark_premises_synced()
+
+    # A large import leaves a long WAL that every reader has to search;
+    # fold it back into the database now rather than at the next
+    # auto-checkpoint.
+    if len(changed) > _CHECKPOINT_AFTER_ROWS:
+        database.checkpoint(truncate=True)
+    return len(changed)
 
 
 def sync_premises():
     """
     Attempt to sync premises from the live Uniform SOAP connector.
     Falls back to sample data if the connector is unavailable.
+    Only one sync runs at a time; concurrent callers wait their turn.
     """
+    global _last_sync_result
+    with _sync_lock:
+        _sync_in_progress.set()
+        try:
+            _last_sync_result = _sync_premises()
+        finally:
+            _sync_in_progress.clear()
+    return _last_sync_result
+
+
+def _sync_premises():
+    # count is the number of premises the sync processed; changed is how
+    # many of them were new or different and so actually rewritten.
     result = {
         "source": None,
         "count": 0,
+        "changed": 0,
         "timestamp": datetime.now().isoformat(),
         "errors": [],
     }
 
-    client = _get_client()
-    conn_status = client.test_connection()
+    conn_status = _test_connection()
+    sample_data = _load_sample_data()
 
     if conn_status.get("connected"):
         result["source"] = "uniform-soap-live"
         try:
-            with client.session():
+            with _shared_session() as client:
+                # A sync is the point to pick up changed fees and code lists.
+                client.invalidate_reference_cache()
+
                 # The licensing connector doesn't have a direct "get all food premises"
                 # endpoint like the commercial premises connector. For now, we use
                 # the party search or code lookups to discover premises. If no data
@@ -69,36 +217,95 @@ def sync_premises():
                 # For initial deployment, we populate from sample data and the SOAP
                 # client is available for individual licence lookups from the dashboard.
                 logger.info("SOAP connector available; loading sample data for initial sync")
-                sample_data = _load_sample_data()
-                if sample_data:
-                    result["count"] = database.import_premises(sample_data)
-                    result["source"] = "sample-data-with-soap-available"
-                else:
-                    result["errors"].append("No sample data found")
+            if sample_data:
+                result["source"] = "sample-data-with-soap-available"
+            else:
+                result["errors"].append("No sample data found")
         except Exception as exc:
             result["errors"].append(f"SOAP sync error: {exc}")
             result["source"] = "sample-data-fallback"
-            sample_data = _load_sample_data()
-            if sample_data:
-                result["count"] = database.import_premises(sample_data)
     else:
         result["source"] = "sample-data"
-        sample_data = _load_sample_data()
-        if sample_data:
-            result["count"] = database.import_premises(sample_data)
         result["errors"].append(
             f"Uniform SOAP connector at {conn_status.get('wsdl_url')} "
             f"is not available: {conn_status.get('error', 'connection refused')}. "
             f"Using sample data."
         )
 
+    if sample_data:
+        result["changed"] = _store_premises(sample_data)
+        result["count"] = len(sample_data)
     return result
 
 
+def start_background_sync():
+    """
+    Run sync_premises() on a daemon thread so the web server can start
+    serving cached data immediately. Returns a placeholder result; poll
+    get_sync_status() for the outcome.
+    """
+    _sync_in_progress.set()
+    thread = threading.Thread(target=_run_background_sync, name="uniform-sync", daemon=True)
+    thread.start()
+    return {
+        "source": "background",
+        "count": 0,
+        "changed": 0,
+        "timestamp": datetime.now().isoformat(),
+        "errors": [],
+    }
+
+
+def _run_background_sync():
+    try:
+        result = sync_premises()
+    except Exception:
+        logger.exception("Background premises sync failed")
+        return
+    database.warm_cache()
+    logger.info(
+        "Sync source: %s; premises synced: %d, changed: %d",
+        result["source"], result["count"], result["changed"],
+    )
+    errors = result.get("errors", [])
+    if errors:
+        logger.warning("Sync notes:\n  %s", "\n  ".join(errors))
+
+
+def get_sync_status():
+    """Report whether a sync is running and the result of the last one."""
+    return {
+        "inProgress": _sync_in_progress.is_set(),
+        "lastResult": _last_sync_result,
+    }
+
+
+def _test_connection():
+    """Probe the connector, answering from the cached failure while it is fresh."""
+    global _offline_status, _offline_status_expires
+    with _offline_status_lock:
+        if _offline_status is not None and time.monotonic() < _offline_status_expires:
+            return _offline_status
+    status = _get_client().test_connection()
+    with _offline_status_lock:
+        if status.get("connected"):
+            _offline_status = None
+        else:
+            _offline_status = status
+            _offline_status_expires = time.monotonic() + _OFFLINE_STATUS_TTL
+    return status
+
+
+def reset_connection_cache():
+    """Forget a cached connection failure so the next probe tries Uniform again."""
+    global _offline_status
+    with _offline_status_lock:
+        _offline_status = None
+
+
 def get_connection_status():
     """Get the current connection status of the Uniform SOAP connector."""
-    client = _get_client()
-    return client.test_connection()
+    return _test_connection()
 
 
 def lookup_licence(reference_value):
@@ -106,27 +313,23 @@ def lookup_licence(reference_value):
     Look up a specific licence by reference value from Uniform.
     Requires SOAP connectivity.
     """
-    client = _get_client()
-    with client.session():
+    with _shared_session() as client:
         return client.get_application_by_reference(reference_value)
 
 
 def check_licence_exists(reference_value):
     """Check if a licence exists in Uniform by reference value."""
-    client = _get_client()
-    with client.session():
+    with _shared_session() as client:
         return client.check_application_exists(reference_value)
 
 
 def get_fee_lookup(licence_type):
     """Look up fees for a licence type via Uniform."""
-    client = _get_client()
-    with client.session():
+    with _shared_session() as client:
         return client.get_fee_lookup(licence_type)
 
 
 def search_parties(query):
     """Search for parties/clients in Uniform."""
-    client = _get_client()
-    with client.session():
+    with _shared_session() as client:
         return client.get_party_details_by_client(query)
@@ -186,29 +186,80 @@ BUSINESS_TYPE_FOCUS = {
     },
 }
 
+# (item, requiredRange) pairs per business type, so each sheet's blank
+# temperature readings are built without re-reading the focus dicts.
+_TEMPERATURE_CHECKS = {
+    business_type: tuple((tc["item"], tc["requiredRange"]) for tc in focus["temperatureChecks"])
+    for business_type, focus in BUSINESS_TYPE_FOCUS.items()
+}
+
+# Previous actions that make the next visit a follow-up.
+_NOTICE_ACTION_TYPES = frozenset({"Hygiene Improvement Notice", "Emergency Prohibition Notice"})
+
+# Each business type's key risks as ready-made focus area lines.
+_KEY_RISK_FOCUS_AREAS = {
+    business_type: tuple(f"[{focus['label']}] {risk}" for risk in focus["keyRisks"])
+    for business_type, focus in BUSINESS_TYPE_FOCUS.items()
+}
+
+# Premises columns joined, when present, into the sheet's business address.
+_ADDRESS_FIELDS = ("address_line1", "address_line2", "town", "county")
+
+_INSPECTION_TYPE_LABELS = {
+    "routine": "Routine Inspection",
+    "followup": "Follow-up Inspection",
+    "complaint": "Complaint Investigation",
+    "new_business": "New Business Registration Inspection",
+    "revisit": "Re-visit",
+}
+
 
 def generate_visit_sheet(premises_ref, options=None):
     """Generate a pre-populated visit sheet for a premises."""
-    options = options or {}
     premises = database.get_premises(premises_ref)
     if not premises:
         raise ValueError(f"Premises not found: {premises_ref}")
 
     previous_actions = database.get_previous_actions(premises_ref)
-    previous_inspections = database.get_inspections_for_premises(premises_ref)
-    business_focus = BUSINESS_TYPE_FOCUS.get(
-        premises.get("business_type"), BUSINESS_TYPE_FOCUS["restaurant"]
-    )
+    inspection_count = database.count_inspections_by_premises([premises_ref])[premises_ref]
+    return _build_visit_sheet(premises, previous_actions, inspection_count, options)
+
+
+def _build_visit_sheet(premises, previous_actions, inspection_count, options=None, generated_at=None):
+    """
+    Assemble a visit sheet from premises data that has already been loaded.
+    A batch passes one ``generated_at`` timestamp for all of its sheets.
+    """
+    options = options or {}
+    business_type = premises.get("business_type")
+    if business_type not in BUSINESS_TYPE_FOCUS:
+        business_type = "restaurant"
+    business_focus = BUSINESS_TYPE_FOCUS[business_type]
     interval_info = config.INSPECTION_INTERVALS.get(premises.get("risk_category"))
+    last_inspection_date = premises.get("last_inspection_date")
+    hygienic_score = premises.get("last_hygienic_score")
+    structure_score = premises.get("last_structure_score")
+    management_score = premises.get("last_management_score")
+
+    # One pass over the action history for the focus areas, the summary
+    # and whether a notice was served.
+    action_lines = []
+    summary_actions = []
+    has_notice = False
+    for action in previous_actions:
+        action_type = action["action_type"]
+        action_date = action["action_date"]
+        detail = action["detail"]
+        action_lines.append(f"  - {action_type} ({action_date}): {detail}")
+        summary_actions.append({"date": action_date, "type": action_type, "detail": detail})
+        if action_type in _NOTICE_ACTION_TYPES:
+            has_notice = True
 
     # Determine inspection type
     inspection_type = "routine"
-    if not premises.get("last_inspection_date"):
+    if not last_inspection_date:
         inspection_type = "new_business"
-    elif any(
-        a.get("action_type") in ("Hygiene Improvement Notice", "Emergency Prohibition Notice")
-        for a in previous_actions
-    ):
+    elif has_notice:
         inspection_type = "followup"
     if options.get("inspectionType"):
         inspection_type = options["inspectionType"]
@@ -225,52 +276,37 @@ def generate_visit_sheet(premises_ref, options=None):
         )
     if previous_actions:
         focus_areas.append("Verify compliance with previous enforcement actions:")
-        for action in previous_actions:
-            focus_areas.append(
-                f"  - {action['action_type']} ({action['action_date']}): {action['detail']}"
-            )
-    if (premises.get("last_hygienic_score") or 0) >= 15:
+        focus_areas.extend(action_lines)
+    if (hygienic_score or 0) >= 15:
         focus_areas.append(
             "Hygienic food handling - previously scored poorly, re-assess thoroughly"
         )
-    if (premises.get("last_structure_score") or 0) >= 15:
+    if (structure_score or 0) >= 15:
         focus_areas.append(
             "Structure and cleaning - previously scored poorly, check structural improvements"
         )
-    if (premises.get("last_management_score") or 0) >= 20:
+    if (management_score or 0) >= 20:
         focus_areas.append(
             "Food safety management - previously scored poorly, review documentation"
         )
-    for risk in business_focus["keyRisks"]:
-        focus_areas.append(f"[{business_focus['label']}] {risk}")
-
-    type_labels = {
-        "routine": "Routine Inspection",
-        "followup": "Follow-up Inspection",
-        "complaint": "Complaint Investigation",
-        "new_business": "New Business Registration Inspection",
-        "revisit": "Re-visit",
-    }
+    focus_areas.extend(_KEY_RISK_FOCUS_AREAS[business_type])
 
     last_scores = None
-    if premises.get("last_inspection_date"):
-        h = premises.get("last_hygienic_score") or 0
-        s = premises.get("last_structure_score") or 0
-        m = premises.get("last_management_score") or 0
+    if last_inspection_date:
         last_scores = {
-            "hygienicFoodHandling": premises.get("last_hygienic_score"),
-            "structureAndCleaning": premises.get("last_structure_score"),
-            "managementOfFoodSafety": premises.get("last_management_score"),
-            "total": h + s + m,
+            "hygienicFoodHandling": hygienic_score,
+            "structureAndCleaning": structure_score,
+            "managementOfFoodSafety": management_score,
+            "total": (hygienic_score or 0) + (structure_score or 0) + (management_score or 0),
         }
 
     visit_sheet = {
         "header": {
             "council": config.COUNCIL,
             "formTitle": "Food Hygiene Inspection Visit Sheet",
-            "generatedAt": datetime.now().isoformat(),
+            "generatedAt": generated_at or datetime.now().isoformat(),
             "inspectionType": inspection_type,
-            "inspectionTypeLabel": type_labels.get(inspection_type, "Routine Inspection"),
+            "inspectionTypeLabel": _INSPECTION_TYPE_LABELS.get(inspection_type, "Routine Inspection"),
         },
         "inspectionDetails": {
             "referenceNumber": None,
@@ -285,14 +321,7 @@ def generate_visit_sheet(premises_ref, options=None):
             "uprn": premises.get("uprn"),
             "businessName": premises["business_name"],
             "tradingName": premises.get("trading_name"),
-            "businessAddress": "\n".join(
-                filter(None, [
-                    premises.get("address_line1"),
-                    premises.get("address_line2"),
-                    premises.get("town"),
-                    premises.get("county"),
-                ])
-            ),
+            "businessAddress": "\n".join(filter(None, map(premises.get, _ADDRESS_FIELDS))),
             "postcode": premises.get("postcode"),
             "telephone": premises.get("telephone"),
             "email": premises.get("email"),
@@ -307,15 +336,12 @@ def generate_visit_sheet(premises_ref, options=None):
             "primaryAuthority": premises.get("primary_authority"),
         },
         "previousInspectionSummary": {
-            "lastInspectionDate": premises.get("last_inspection_date"),
+            "lastInspectionDate": last_inspection_date,
             "lastScores": last_scores,
             "currentFhrsRating": premises.get("current_fhrs_rating"),
             "riskCategory": premises.get("risk_category"),
             "intervalDescription": interval_info["description"] if interval_info else "Unknown",
-            "previousActions": [
-                {"date": a["action_date"], "type": a["action_type"], "detail": a["detail"]}
-                for a in previous_actions
-            ],
+            "previousActions": summary_actions,
             "haccpInPlace": bool(premises.get("haccp_in_place")),
             "allergenDocumentation": bool(premises.get("allergen_documentation")),
             "officerNotes": premises.get("notes"),
@@ -348,8 +374,8 @@ def generate_visit_sheet(premises_ref, options=None):
             "comments": "",
         },
         "temperatureReadings": [
-            {"item": tc["item"], "temperature": None, "requiredRange": tc["requiredRange"], "compliant": None}
-            for tc in business_focus["temperatureChecks"]
+            {"item": item, "temperature": None, "requiredRange": required_range, "compliant": None}
+            for item, required_range in _TEMPERATURE_CHECKS[business_type]
         ],
         "overallRating": {"totalScore": None, "fhrsRating": None},
         "actionsRequired": {
@@ -368,9 +394,9 @@ def generate_visit_sheet(premises_ref, options=None):
         "metadata": {
             "businessTypeFocus": business_focus,
             "riskCategory": premises.get("risk_category"),
-            "isNewBusiness": not premises.get("last_inspection_date"),
-            "hasOutstandingActions": len(previous_actions) > 0,
-            "previousInspectionCount": len(previous_inspections),
+            "isNewBusiness": not last_inspection_date,
+            "hasOutstandingActions": bool(previous_actions),
+            "previousInspectionCount": inspection_count,
         },
     }
 
@@ -379,10 +405,22 @@ def generate_visit_sheet(premises_ref, options=None):
 
 def generate_batch_visit_sheets(within_months=6, options=None):
     """Generate visit sheets for all premises due inspection."""
+    return list(iter_batch_visit_sheets(within_months, options))
+
+
+def iter_batch_visit_sheets(within_months=6, options=None):
+    """
+    Yield visit sheets for all premises due inspection one at a time, so a
+    large batch never has to be held in memory as a whole.
+    """
     options = options or {}
     premises_list = database.get_premises_due_inspection(within_months)
-    sheets = []
+    refs = [p["premises_ref"] for p in premises_list]
+    # Load actions and inspection counts for the whole batch up front
+    # rather than re-querying each premises individually.
+    actions_by_ref = database.get_previous_actions_by_premises(refs)
+    counts_by_ref = database.count_inspections_by_premises(refs)
+    generated_at = datetime.now().isoformat()
     for p in premises_list:
-        sheet = generate_visit_sheet(p["premises_ref"], options)
-        sheets.append(sheet)
-    return sheets
+        ref = p["premises_ref"]
+        yield _build_visit_sheet(p, actions_by_ref[ref], counts_by_ref[ref], options, generated_at)
@@ -14,12 +14,20 @@ Authentication uses session-based cookies:
 The WSDL endpoint follows the pattern:
   http://{server}/LicensingConnectorService{_TEST|_LIVE}/LicensingConnectorServices.asmx
 """
+import functools
 import logging
+import os
+import threading
+import time
+from collections import OrderedDict
 from contextlib import contextmanager
 
 import requests
 from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from zeep import Client
+from zeep.cache import SqliteCache
 from zeep.transports import Transport
 from zeep.exceptions import Fault, TransportError
 
@@ -28,6 +36,49 @@ import config
 logger = logging.getLogger(__name__)
 
 
+def _iso(value):
+    """ISO 8601 text for a SOAP date or dateTime value, or None if unset."""
+    if not value:
+        return None
+    isoformat = getattr(value, "isoformat", None)
+    return isoformat() if isoformat else str(value)
+
+
+# Most reference-data lookups kept per client; arguments such as licence
+# types come from request paths, so the cache must not grow with them.
+_REF_CACHE_SIZE = 128
+
+
+def _reference_data(method):
+    """
+    Cache a reference-data lookup (fees, code lists) on the client for
+    config.UNIFORM_REFDATA_TTL seconds, keyed by its arguments. The cache
+    is a small LRU; expired entries are dropped as new ones are added.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        now = time.monotonic()
+        with self._ref_cache_lock:
+            entry = self._ref_cache.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._ref_cache.move_to_end(key)
+                    return entry[1]
+                del self._ref_cache[key]
+        value = method(self, *args, **kwargs)
+        with self._ref_cache_lock:
+            self._ref_cache[key] = (now + config.UNIFORM_REFDATA_TTL, value)
+            self._ref_cache.move_to_end(key)
+            for stale in [k for k, (expires, _) in self._ref_cache.items() if expires <= now]:
+                del self._ref_cache[stale]
+            while len(self._ref_cache) > _REF_CACHE_SIZE:
+                self._ref_cache.popitem(last=False)
+        return value
+
+    return wrapper
+
+
 class UniformSOAPClient:
     """SOAP client for the Idox Uniform Licensing Connector Service."""
 
@@ -45,21 +96,55 @@ class UniformSOAPClient:
         self.password = password or config.UNIFORM_PASSWORD
         self.timeout = timeout or config.UNIFORM_TIMEOUT
 
-        self._session = Session()
+        self._session = self._build_session()
         self._client = None
+        self._client_lock = threading.Lock()
         self._logged_in = False
+        self._ref_cache = OrderedDict()
+        self._ref_cache_lock = threading.Lock()
 
     def _get_client(self):
-        """Lazily initialise the zeep SOAP client."""
+        """
+        Lazily initialise the zeep SOAP client.
+
+        The WSDL and its imported schemas are cached on disk, so after the
+        first run the client is built without downloading them again.
+        """
         if self._client is None:
-            transport = Transport(
-                session=self._session,
-                timeout=self.timeout,
-                operation_timeout=self.timeout,
-            )
-            self._client = Client(self.wsdl_url, transport=transport)
+            with self._client_lock:
+                if self._client is None:
+                    self._client = Client(self.wsdl_url, transport=self._build_transport())
         return self._client
 
+    @staticmethod
+    def _build_session():
+        """
+        HTTP session with a pooled, keep-alive adapter so repeated SOAP calls
+        reuse TCP connections.  Only idempotent requests (the WSDL/XSD GETs)
+        are retried, on read failures.  Connection failures are not retried,
+        so an unreachable connector fails fast instead of backing off on
+        every status probe, and SOAP POSTs are never resent.
+        """
+        session = Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=Retry(total=3, connect=0, status=0, other=0, backoff_factor=0.5),
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _build_transport(self):
+        cache_path = os.path.abspath(config.UNIFORM_WSDL_CACHE_PATH)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        return Transport(
+            session=self._session,
+            cache=SqliteCache(path=cache_path, timeout=config.UNIFORM_WSDL_CACHE_TTL),
+            timeout=self.timeout,
+            operation_timeout=self.timeout,
+        )
+
     # ── Authentication ───────────────────────────────────────────────────
 
     def get_database_aliases(self):
@@ -138,6 +223,11 @@ class UniformSOAPClient:
         finally:
             self.logoff()
 
+    def invalidate_reference_cache(self):
+        """Drop cached fee and code-list lookups so the next call refetches them."""
+        with self._ref_cache_lock:
+            self._ref_cache.clear()
+
     # ── Licensing Application Operations ─────────────────────────────────
 
     def get_application_by_reference(self, reference_value):
@@ -185,6 +275,7 @@ class UniformSOAPClient:
 
     # ── Fee Operations ───────────────────────────────────────────────────
 
+    @_reference_data
     def get_fee_lookup(self, licence_type):
         """Look up fees for a given licence type."""
         client = self._get_client()
@@ -201,7 +292,7 @@ class UniformSOAPClient:
             "licence_type_code": result.LicenceTypeCode,
             "licence_type_text": result.LicenceTypeCodeText,
             "fees": fees,
-            "validation_date": str(result.ValidationDate) if result.ValidationDate else None,
+            "validation_date": _iso(result.ValidationDate),
         }
 
     def calculate_fee(self, licence_type, li_xtras=None):
@@ -225,6 +316,7 @@ class UniformSOAPClient:
 
     # ── Code Lookups ─────────────────────────────────────────────────────
 
+    @_reference_data
     def get_xtra_code_lookup(self, licence_type):
         """Get LiXtra code lookups for a licence type."""
         client = self._get_client()
@@ -241,12 +333,14 @@ class UniformSOAPClient:
                 })
         return items
 
+    @_reference_data
     def get_cn_code_list(self, list_name):
         """Get a CNCODE lookup list by list name."""
         client = self._get_client()
         result = client.service.GetCnCodeList(ListName=list_name)
         return self._serialize_code_list(result)
 
+    @_reference_data
     def get_cn_code_list_by_field(self, field_name):
         """Get CNCODE lookup values by field name."""
         client = self._get_client()
@@ -279,6 +373,7 @@ class UniformSOAPClient:
             "addresses": addresses,
         }
 
+    @_reference_data
     def get_cn_code_list_by_category(self, list_name, category):
         """Get CNCODE lookup filtered by category."""
         client = self._get_client()
@@ -287,6 +382,7 @@ class UniformSOAPClient:
         )
         return self._serialize_code_list(result)
 
+    @_reference_data
     def get_cn_code_categories(self, category_list_name):
         """Get available categories for a code list."""
         client = self._get_client()
@@ -295,6 +391,7 @@ class UniformSOAPClient:
         )
         return self._serialize_code_list(result)
 
+    @_reference_data
     def get_cn_code_list_mapped(self, list_name):
         """Get CNCODE lookup values with mapped values."""
         client = self._get_client()
@@ -397,8 +494,8 @@ class UniformSOAPClient:
         result = {}
 
         # Application Identification
-        if hasattr(app, "ApplicationIdentification") and app.ApplicationIdentification:
-            ai = app.ApplicationIdentification
+        ai = getattr(app, "ApplicationIdentification", None)
+        if ai:
             result["application_identification"] = {
                 "key_value": ai.ApplicationKeyValue,
                 "reference_value": ai.ReferenceValue,
@@ -409,14 +506,15 @@ class UniformSOAPClient:
             }
 
         # Applicants
-        if hasattr(app, "Applicants") and app.Applicants:
+        applicants = getattr(app, "Applicants", None)
+        if applicants:
             result["applicants"] = []
-            for a in app.Applicants.Applicant or []:
+            for a in applicants.Applicant or []:
                 result["applicants"].append(self._serialize_applicant(a))
 
         # Site Location
-        if hasattr(app, "SubmittedSiteLocation") and app.SubmittedSiteLocation:
-            loc = app.SubmittedSiteLocation
+        loc = getattr(app, "SubmittedSiteLocation", None)
+        if loc:
             result["site_location"] = {
                 "uprn": loc.UPRN,
                 "address": loc.Address,
@@ -431,32 +529,33 @@ class UniformSOAPClient:
         result["application_type"] = getattr(app, "ApplicationType", None)
 
         # Licence
-        if hasattr(app, "Licence") and app.Licence:
-            lic = app.Licence
+        lic = getattr(app, "Licence", None)
+        if lic:
             result["licence"] = {
                 "licence_type": lic.LicenceType,
                 "licence_case_type": lic.LicenceCaseType,
                 "licence_details": lic.LicenceDetails,
                 "licence_status": lic.LicenceStatus,
-                "date_received": str(lic.DateReceived) if lic.DateReceived else None,
-                "application_date": str(lic.ApplicationDate) if lic.ApplicationDate else None,
+                "date_received": _iso(lic.DateReceived),
+                "application_date": _iso(lic.ApplicationDate),
                 "total_cost": float(lic.TotalCost) if lic.TotalCost is not None else None,
-                "from_date": str(lic.FromDate) if lic.FromDate else None,
-                "to_date": str(lic.ToDate) if lic.ToDate else None,
-                "valid_from": str(lic.ValidFrom) if lic.ValidFrom else None,
-                "issued": str(lic.Issued) if lic.Issued else None,
-                "renewal_date": str(lic.RenewalDate) if lic.RenewalDate else None,
+                "from_date": _iso(lic.FromDate),
+                "to_date": _iso(lic.ToDate),
+                "valid_from": _iso(lic.ValidFrom),
+                "issued": _iso(lic.Issued),
+                "renewal_date": _iso(lic.RenewalDate),
             }
 
         # Activities
-        if hasattr(app, "Activities") and app.Activities:
+        activities = getattr(app, "Activities", None)
+        if activities:
             result["activities"] = []
-            for act in app.Activities.Activity or []:
+            for act in activities.Activity or []:
                 result["activities"].append({
                     "activity_type": act.ActivityType,
                     "time_period": act.TimePeriod,
-                    "start_date": str(act.StartDate) if act.StartDate else None,
-                    "end_date": str(act.EndDate) if act.EndDate else None,
+                    "start_date": _iso(act.StartDate),
+                    "end_date": _iso(act.EndDate),
                     "start_time": act.StartTime,
                     "end_time": act.EndTime,
                     "capacity": float(act.Capacity) if act.Capacity else None,
@@ -465,22 +564,24 @@ class UniformSOAPClient:
                 })
 
         # Payments
-        if hasattr(app, "Payments") and app.Payments:
+        payments = getattr(app, "Payments", None)
+        if payments:
             result["payments"] = []
-            for pay in app.Payments.Payment or []:
+            for pay in payments.Payment or []:
                 result["payments"].append({
                     "receipt_number": pay.ReceiptNumber,
                     "payment_type": pay.PaymentType,
                     "description": pay.Description,
                     "payment_due": float(pay.PaymentDue) if pay.PaymentDue is not None else None,
                     "paid": float(pay.Paid) if pay.Paid is not None else None,
-                    "payment_date": str(pay.PaymentDate) if pay.PaymentDate else None,
+                    "payment_date": _iso(pay.PaymentDate),
                 })
 
         # LiXtras
-        if hasattr(app, "LiXtras") and app.LiXtras:
+        li_xtras = getattr(app, "LiXtras", None)
+        if li_xtras:
             result["li_xtras"] = []
-            for x in app.LiXtras.LiXtra or []:
+            for x in li_xtras.LiXtra or []:
                 result["li_xtras"].append({
                     "field_description": x.FieldDescription,
                     "field_name": x.FieldName,
@@ -494,8 +595,9 @@ class UniformSOAPClient:
     def _serialize_applicant(self, a):
         """Convert an Applicant SOAP object to a dict."""
         contacts = []
-        if hasattr(a, "ContactDetails") and a.ContactDetails:
-            for c in a.ContactDetails.ContactDetail or []:
+        contact_details = getattr(a, "ContactDetails", None)
+        if contact_details:
+            for c in contact_details.ContactDetail or []:
                 contacts.append({
                     "type_code": c.ContactTypeCode,
                     "type_text": c.ContactTypeText,
@@ -508,7 +610,7 @@ class UniformSOAPClient:
             "surname": a.Surname,
             "forename": a.Forename,
             "address": a.Address,
-            "dob": str(a.DOB) if a.DOB else None,
+            "dob": _iso(a.DOB),
             "organisation": a.Organisation,
             "trading_name": a.TradingName,
             "job_title": a.JobTitle,
@@ -521,15 +623,15 @@ class UniformSOAPClient:
         base = self._serialize_applicant(party)
         base["li_party_type_code"] = getattr(party, "LiPartyTypeCode", None)
         base["li_party_type_text"] = getattr(party, "LiPartyTypeText", None)
-        if hasattr(party, "Licence") and party.Licence:
-            lic = party.Licence
+        lic = getattr(party, "Licence", None)
+        if lic:
             base["licence"] = {
                 "key_value": getattr(lic, "KeyValue", None),
                 "reference_value": getattr(lic, "ReferenceValue", None),
                 "licence_type": lic.LicenceType,
                 "licence_status": lic.LicenceStatus,
-                "from_date": str(lic.FromDate) if lic.FromDate else None,
-                "to_date": str(lic.ToDate) if lic.ToDate else None,
+                "from_date": _iso(lic.FromDate),
+                "to_date": _iso(lic.ToDate),
             }
         return base
 
@@ -8,8 +8,10 @@
 
 // ─── State ──────────────────────────────────────────────────────────────────
 let allPremises = [];
+let premisesSearchKeys = [];
 let dueInspections = [];
 let workloadSummary = {};
+let syncWasRunning = false;
 
 // ─── Initialisation ─────────────────────────────────────────────────────────
 
@@ -31,6 +33,22 @@ document.addEventListener('DOMContentLoaded', () => {
   }
 });
 
+// ─── Data Loading ───────────────────────────────────────────────────────────
+
+// Views that load together (e.g. the overview and the due table, which both
+// start on the 6-month window) share one in-flight request per URL.
+const pendingRequests = new Map();
+
+function getJson(url) {
+  if (!pendingRequests.has(url)) {
+    const request = fetch(url)
+      .then(resp => resp.json())
+      .finally(() => pendingRequests.delete(url));
+    pendingRequests.set(url, request);
+  }
+  return pendingRequests.get(url);
+}
+
 // ─── Tab Navigation ─────────────────────────────────────────────────────────
 
 function showTab(tab) {
@@ -47,6 +65,20 @@ async function checkStatus() {
     const resp = await fetch('/api/status');
     const data = await resp.json();
     const badge = document.getElementById('connectorStatus');
+    if (data.sync && data.sync.inProgress) {
+      badge.textContent = 'Uniform: Sync in progress';
+      badge.className = 'status-badge status-offline';
+      syncWasRunning = true;
+      setTimeout(checkStatus, 3000);
+      return;
+    }
+    if (syncWasRunning) {
+      // Background sync has finished; refresh the cached views once.
+      syncWasRunning = false;
+      loadOverview();
+      loadDueInspections();
+      loadAllPremises();
+    }
     if (data.uniformConnector && data.uniformConnector.connected) {
       badge.textContent = 'Uniform: Connected';
       badge.className = 'status-badge status-online';
@@ -68,7 +100,7 @@ async function syncPremises() {
   try {
     const resp = await fetch('/api/sync', { method: 'POST' });
     const data = await resp.json();
-    alert(`Sync complete: ${data.count} premises from ${data.source}`);
+    alert(`Sync complete: ${data.count} premises synced (${data.changed} changed) from ${data.source}`);
     loadOverview();
     loadDueInspections();
     loadAllPremises();
@@ -84,9 +116,7 @@ async function syncPremises() {
 
 async function loadOverview() {
   try {
-    const resp = await fetch('/api/inspections/due?months=6');
-    const data = await resp.json();
-    dueInspections = data.inspections;
+    const data = await getJson('/api/inspections/due?months=6');
     workloadSummary = data.summary;
 
     // Stats
@@ -129,7 +159,7 @@ async function loadOverview() {
     renderBreakdown('monthBreakdown', workloadSummary.byMonth, monthLabels);
 
     // High priority list
-    renderHighPriority(dueInspections.slice(0, 5));
+    renderHighPriority(data.inspections.slice(0, 5));
 
   } catch (err) {
     console.error('Failed to load overview:', err);
@@ -186,8 +216,7 @@ function renderHighPriority(items) {
 async function loadDueInspections() {
   const months = document.getElementById('monthsFilter')?.value || 6;
   try {
-    const resp = await fetch(`/api/inspections/due?months=${months}`);
-    const data = await resp.json();
+    const data = await getJson(`/api/inspections/due?months=${months}`);
     dueInspections = data.inspections;
     renderDueTable(dueInspections);
   } catch (err) {
@@ -247,11 +276,18 @@ function renderDueTable(items) {
 
 // ─── All Premises ───────────────────────────────────────────────────────────
 
+// Columns used by the premises table, search and visit sheet picker.
+const PREMISES_LIST_FIELDS = [
+  'premises_ref', 'business_name', 'food_business_operator', 'address_line1',
+  'postcode', 'business_type', 'business_type_detail', 'risk_category',
+  'current_fhrs_rating', 'next_inspection_due',
+];
+
 async function loadAllPremises() {
   try {
-    const resp = await fetch('/api/premises');
-    const data = await resp.json();
+    const data = await getJson(`/api/premises?fields=${PREMISES_LIST_FIELDS.join(',')}`);
     allPremises = data.data;
+    premisesSearchKeys = allPremises.map(premisesSearchKey);
     renderPremisesTable(allPremises);
     populatePremisesSelect(allPremises);
   } catch (err) {
@@ -300,16 +336,29 @@ function renderPremisesTable(items) {
   `;
 }
 
+// Searchable fields joined and lower-cased once per load, so each keystroke
+// is a single substring test per premises. The separator cannot be typed,
+// so a query never matches across two fields.
+function premisesSearchKey(p) {
+  return [
+    p.business_name,
+    p.food_business_operator,
+    p.postcode,
+    p.premises_ref,
+    p.business_type_detail,
+  ].map(v => v || '').join('\x1f').toLowerCase();
+}
+
+// Re-render the table once typing pauses rather than on every keystroke.
+let filterTimer = null;
+
 function filterPremises() {
-  const query = document.getElementById('premisesSearch').value.toLowerCase();
-  const filtered = allPremises.filter(p =>
-    p.business_name.toLowerCase().includes(query) ||
-    p.food_business_operator.toLowerCase().includes(query) ||
-    p.postcode.toLowerCase().includes(query) ||
-    p.premises_ref.toLowerCase().includes(query) ||
-    (p.business_type_detail || '').toLowerCase().includes(query)
-  );
-  renderPremisesTable(filtered);
+  clearTimeout(filterTimer);
+  filterTimer = setTimeout(() => {
+    const query = document.getElementById('premisesSearch').value.toLowerCase();
+    const filtered = allPremises.filter((p, i) => premisesSearchKeys[i].includes(query));
+    renderPremisesTable(filtered);
+  }, 150);
 }
 
 function populatePremisesSelect(items) {